@@ -1,190 +1,54 @@
-import difflib
+import atexit
 import json
-import datetime
-import unicodedata
 import os
 import csv
-from nltk.stem.snowball import SnowballStemmer
+import queue
+import threading
 import tkinter as tk
 from tkinter import scrolledtext, simpledialog, messagebox
-
-# =========================================
-# Configuración y constantes
-# =========================================
-stemmer = SnowballStemmer('spanish')
-
-# Archivos de datos ubicados en el mismo directorio que este script
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-NOMBRE_CSV = os.path.join(BASE_DIR, 'preguntas.csv')
-NOMBRE_TXT = os.path.join(BASE_DIR, 'preguntas.txt')
-NOMBRE_JSON = os.path.join(BASE_DIR, 'preguntas.json')
-LOG_FILE = os.path.join(BASE_DIR, 'log.txt')
-SIMILARITY_THRESHOLD = 0.7
-
-# =========================================
-# Funciones originales de lectura y procesamiento
-# =========================================
-
-def leer_preguntas_csv(nombre_archivo):
-    """
-    Objetivo: Leer preguntas y respuestas desde un archivo CSV separado por ';'.
-    Parámetros de Entrada: nombre_archivo (str): Nombre del archivo CSV a leer.
-    Parámetros de Salida: list: Lista de tuplas con pares (pregunta, respuesta).
-    """
-    preguntas_respuestas = []
-    try:
-        with open(nombre_archivo, newline='', encoding='utf-8-sig') as csvfile:
-            reader = csv.reader(csvfile, delimiter=';')
-            try:
-                first_row = next(reader)
-            except StopIteration:
-                return preguntas_respuestas
-            if first_row and first_row[0].strip().lower() == 'pregunta':
-                pass
-            else:
-                preguntas_respuestas.append((first_row[0], first_row[1]) if len(first_row) >= 2 else (first_row[0], ""))
-            for row in reader:
-                if not row:
-                    continue
-                pregunta = row[0].strip()
-                respuesta = row[1].strip() if len(row) > 1 else ""
-                preguntas_respuestas.append((pregunta, respuesta))
-    except FileNotFoundError:
-        return preguntas_respuestas
-    except Exception as e:
-        print(f"Error al leer el archivo CSV: {e}")
-    return preguntas_respuestas
-
-
-def leer_preguntas_txt(nombre_archivo):
-    """
-    Objetivo: Leer preguntas y respuestas desde un archivo de texto, cada línea con formato "pregunta:respuesta".
-    Parámetros de Entrada: nombre_archivo (str): Nombre del archivo TXT a leer.
-    Parámetros de Salida: list: Lista de tuplas con pares (pregunta, respuesta).
-    """
-    preguntas_respuestas = []
-    try:
-        with open(nombre_archivo, 'r', encoding='utf-8-sig') as txtfile:
-            for line in txtfile:
-                line = line.strip()
-                if not line:
-                    continue
-                parts = line.split(':', 1)
-                pregunta = parts[0].strip()
-                respuesta = parts[1].strip() if len(parts) > 1 else ""
-                preguntas_respuestas.append((pregunta, respuesta))
-    except FileNotFoundError:
-        return preguntas_respuestas
-    except Exception as e:
-        print(f"Error al leer el archivo de texto: {e}")
-    return preguntas_respuestas
-
-
-def leer_preguntas_json(nombre_archivo):
-    """
-    Objetivo: Leer preguntas y respuestas desde un archivo JSON con objetos que contienen "pregunta" y "respuesta".
-    Parámetros de Entrada: nombre_archivo (str): Nombre del archivo JSON a leer.
-    Parámetros de Salida: list: Lista de tuplas con pares (pregunta, respuesta).
-    """
-    preguntas_respuestas = []
-    try:
-        with open(nombre_archivo, 'r', encoding='utf-8-sig') as jsonfile:
-            data = json.load(jsonfile)
-            if isinstance(data, list):
-                for entrada in data:
-                    pregunta = entrada.get("pregunta", "").strip()
-                    respuesta = entrada.get("respuesta", "").strip()
-                    preguntas_respuestas.append((pregunta, respuesta))
-    except FileNotFoundError:
-        return preguntas_respuestas
-    except json.JSONDecodeError:
-        print(f"Error: El archivo JSON '{nombre_archivo}' no es válido.")
-    except Exception as e:
-        print(f"Error al leer el archivo JSON: {e}")
-    return preguntas_respuestas
-
-
-def normalizar_texto(texto):
-    """
-    Objetivo: Normalizar un texto eliminando acentos, puntuación, convirtiendo a minúsculas y aplicando stemización.
-    Parámetros de Entrada: texto (str): Texto a normalizar.
-    Parámetros de Salida: str: Texto normalizado con stemming.
-    """
-    texto = texto.lower()
-    texto = ''.join(ch for ch in unicodedata.normalize('NFD', texto) if unicodedata.category(ch) != 'Mn')
-    texto = texto.translate(str.maketrans('', '', '¿¡!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~'))
-    palabras = texto.split()
-    stems = [stemmer.stem(palabra) for palabra in palabras]
-    return ' '.join(stems)
-
-
-def calcular_similitud(pregunta1, pregunta2):
-    """
-    Objetivo: Calcular el puntaje de similitud entre dos preguntas usando difflib.
-    Parámetros de Entrada: pregunta1 (str), pregunta2 (str): Preguntas a comparar.
-    Parámetros de Salida: float: Puntaje de similitud entre 0 y 1.
-    """
-    norm1 = normalizar_texto(pregunta1)
-    norm2 = normalizar_texto(pregunta2)
-    return difflib.SequenceMatcher(None, norm1, norm2).ratio()
-
-
-def obtener_mejores_coincidencias(pregunta_usuario, base_preguntas, n=3):
-    """
-    Objetivo: Obtener las n preguntas más similares de la base.
-    Parámetros de Entrada: 
-        pregunta_usuario (str): Pregunta ingresada por el usuario.
-        base_preguntas (list): Lista de preguntas y respuestas.
-        n (int): Cantidad de sugerencias a devolver.
-    Parámetros de Salida: list: Lista de tuplas (pregunta, respuesta, similitud).
-    """
-    resultados = []
-    for preg, resp in base_preguntas:
-        sim = calcular_similitud(pregunta_usuario, preg)
-        resultados.append((preg, resp, sim))
-    resultados.sort(key=lambda x: x[2], reverse=True)
-    return resultados[:n]
-
-
-def registrar_en_log(pregunta, respuesta, similitud):
-    """
-    Objetivo: Registrar una interacción en el archivo log.txt.
-    Parámetros de Entrada: 
-        pregunta (str): Pregunta del usuario.
-        respuesta (str): Respuesta entregada.
-        similitud (float): Puntaje de similitud.
-    Parámetros de Salida: None
-    """
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(LOG_FILE, "a", encoding="utf-8") as f:
-        f.write(f"{timestamp}\tPregunta: \"{pregunta}\"\tRespuesta: \"{respuesta}\"\tSimilitud: {similitud:.2f}\n")
+from chatbot_utils import (
+    NOMBRE_CSV, NOMBRE_TXT, NOMBRE_JSON, NOMBRE_JSONL, SIMILARITY_THRESHOLD,
+    leer_preguntas_csv, leer_preguntas_txt, leer_preguntas_json, leer_preguntas_jsonl, agregar_pregunta_json, linea_jsonl,
+    IndicePreguntas, leer_base_con_cache, obtener_mejores_coincidencias, registrar_en_log, cerrar_log,
+)
 
 # =========================================
 # Interfaz gráfica con Tkinter
 # =========================================
-global base_preguntas, file_name, root, chat_area, suggestions_frame, entry
+global base_preguntas, indice_preguntas, file_name, root, chat_area, suggestions_frame, entry
 base_preguntas = []
+indice_preguntas = None
 file_name = None
+append_handle = None
+# La búsqueda de coincidencias corre en un hilo aparte para no congelar la ventana: on_send encola la pregunta,
+# el hilo deja el resultado en resultados y poll_results lo muestra desde el hilo de Tkinter. Las preguntas nuevas
+# también se indexan en ese hilo, en orden con las búsquedas, así indice_preguntas no se comparte entre hilos
+consultas = queue.Queue()  # tuplas (acción, texto) con acción 'buscar' o 'agregar'
+resultados = queue.Queue()  # tuplas (pregunta, sugerencias, error)
 
 
 # =========================================
 
 def load_base_preguntas():
     """
-    Carga la base de preguntas desde el archivo CSV, JSON o TXT.
-    Si no se encuentra ninguno, crea un archivo CSV por defecto.
+    Carga la base de preguntas desde el archivo CSV, JSON, JSONL o TXT.
+    Si no se encuentra ninguno, crea un archivo CSV por defecto. Luego construye el índice de preguntas normalizadas,
+    reutilizando el caché en disco si el archivo de datos no cambió.
     Parámetros de Entrada: None
     Parámetros de Salida: None
     """
-    global base_preguntas, file_name
+    global base_preguntas, indice_preguntas, file_name
     if os.path.exists(NOMBRE_CSV):
-        base_preguntas = leer_preguntas_csv(NOMBRE_CSV)
+        base_preguntas, indice_preguntas = leer_base_con_cache(NOMBRE_CSV, leer_preguntas_csv)
         file_name = NOMBRE_CSV
     elif os.path.exists(NOMBRE_JSON):
-        base_preguntas = leer_preguntas_json(NOMBRE_JSON)
+        base_preguntas, indice_preguntas = leer_base_con_cache(NOMBRE_JSON, leer_preguntas_json)
         file_name = NOMBRE_JSON
+    elif os.path.exists(NOMBRE_JSONL):
+        base_preguntas, indice_preguntas = leer_base_con_cache(NOMBRE_JSONL, leer_preguntas_jsonl)
+        file_name = NOMBRE_JSONL
     elif os.path.exists(NOMBRE_TXT):
-        base_preguntas = leer_preguntas_txt(NOMBRE_TXT)
+        base_preguntas, indice_preguntas = leer_base_con_cache(NOMBRE_TXT, leer_preguntas_txt)
         file_name = NOMBRE_TXT
     else:
         file_name = NOMBRE_CSV
@@ -198,6 +62,7 @@ def load_base_preguntas():
             writer.writerow(['pregunta', 'respuesta'])
             writer.writerows(defaults)
         base_preguntas = defaults
+        indice_preguntas = IndicePreguntas(base_preguntas)
 
 def update_chat(speaker, text):
     """
@@ -207,10 +72,44 @@ def update_chat(speaker, text):
         text (str): Texto a mostrar en el área de chat.
         Parámetros de Salida: None
     """
-    chat_area.config(state='normal')
     chat_area.insert(tk.END, f"{speaker}: {text}\n")
     chat_area.see(tk.END)
-    chat_area.config(state='disabled')
+
+def on_chat_key(event):
+    """
+    Impide que el usuario escriba en el área de chat. El área queda siempre en estado 'normal' para no tener que
+    reconfigurarla en cada mensaje, así que en lugar de deshabilitarla se descartan solo las teclas que editan el
+    texto (caracteres imprimibles, borrado y los atajos de edición de Text). El resto (desplazamiento, selección,
+    copiar con Ctrl+C, Ctrl+Insert o Cmd+C, cambio de foco...) sigue funcionando como con el área deshabilitada.
+    Parámetros de Entrada: event (tk.Event): Evento de teclado.
+    Parámetros de Salida: str: "break" para descartar la tecla, o None para dejarla pasar.
+    """
+    control = event.state & 0x4
+    alt = event.state & 0x8  # Alt/Meta en X11, Command en macOS
+    if event.keysym == 'Return':
+        # Igual que con el área deshabilitada, Enter envía el mensaje escrito en el campo de entrada
+        on_send()
+        return "break"
+    if event.keysym == 'Tab' and not event.state & 0x5:
+        # Text inserta un tabulador cuando está en estado 'normal'; deshabilitada, Tab pasaba al siguiente widget
+        siguiente = event.widget.tk_focusNext()
+        if siguiente is not None:
+            siguiente.focus_set()
+        return "break"
+    if event.keysym in ('BackSpace', 'Delete', 'KP_Delete'):
+        return "break"
+    if event.keysym == 'Insert' and not control:
+        # Insert pega la selección; Ctrl+Insert copia y se deja pasar
+        return "break"
+    if control and event.keysym in ('d', 'h', 'i', 'k', 'o', 't'):
+        # Atajos de edición al estilo emacs de Text (borrar, insertar tabulador o línea, transponer)
+        return "break"
+    if alt and event.keysym == 'd':
+        # Meta+D borra la palabra siguiente
+        return "break"
+    if event.char and event.char.isprintable() and not (control or alt):
+        return "break"
+    return None
 
 def show_suggestions(suggestions, allow_add=False, original_q=None):
     """
@@ -252,6 +151,20 @@ def on_suggestion_click(suggestion):
     entry.insert(0, suggestion)
     on_send()
 
+def get_append_handle():
+    """
+    Devuelve el archivo de datos (CSV, JSONL o TXT) abierto en modo agregado. Se abre la primera vez que se
+    necesita y queda abierto durante toda la sesión; se cierra al salir del programa.
+    Parámetros de Entrada: None
+    Parámetros de Salida: io.TextIOWrapper: Archivo abierto en modo 'a'.
+    """
+    global append_handle
+    if append_handle is None:
+        newline = '' if file_name.endswith('.csv') else None
+        append_handle = open(file_name, 'a', newline=newline, encoding='utf-8-sig')
+        atexit.register(append_handle.close)
+    return append_handle
+
 def prompt_new_answer(question):
     """
     Muestra un cuadro de diálogo para agregar una nueva respuesta a una pregunta.
@@ -263,17 +176,25 @@ def prompt_new_answer(question):
         update_chat("Bot", "No se agregó ninguna respuesta.")
         return
     base_preguntas.append((question, answer))
+    consultas.put(('agregar', question))
     try:
         if file_name.endswith('.json'):
-            with open(file_name, 'w', encoding='utf-8-sig') as f:
-                json.dump([{"pregunta": p, "respuesta": r} for p, r in base_preguntas], f, ensure_ascii=False, indent=4)
+            if not agregar_pregunta_json(file_name, question, answer):
+                with open(file_name, 'w', encoding='utf-8-sig') as f:
+                    json.dump([{"pregunta": p, "respuesta": r} for p, r in base_preguntas], f, ensure_ascii=False, indent=4)
         elif file_name.endswith('.csv'):
-            with open(file_name, 'a', newline='', encoding='utf-8-sig') as f:
-                writer = csv.writer(f, delimiter=';')
-                writer.writerow([question, answer])
+            f = get_append_handle()
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow([question, answer])
+            f.flush()
+        elif file_name.endswith('.jsonl'):
+            f = get_append_handle()
+            f.write(linea_jsonl(question, answer))
+            f.flush()
         else:
-            with open(file_name, 'a', encoding='utf-8-sig') as f:
-                f.write(f"{question}:{answer}\n")
+            f = get_append_handle()
+            f.write(f"{question}:{answer}\n")
+            f.flush()
         update_chat("Bot", "¡Pregunta y respuesta agregadas!")
         registrar_en_log(question, "(Agregada por usuario)", 0.0)
         clear_suggestions()
@@ -293,9 +214,56 @@ def on_send(event=None):
     entry.delete(0, tk.END)
     if user_q.lower() in ["salir", "exit", "quit"]:
         update_chat("Bot", "¡Hasta luego!")
+        cerrar_log()
         root.destroy()
         return
-    sugerencias = obtener_mejores_coincidencias(user_q, base_preguntas)
+    consultas.put(('buscar', user_q))
+
+def matching_worker():
+    """
+    Hilo de búsqueda: atiende en orden lo encolado en consultas. Busca las sugerencias de cada pregunta de on_send y
+    las deja en resultados, e indexa las preguntas agregadas por prompt_new_answer. Un error se informa en resultados
+    en lugar de terminar el hilo, para que las preguntas siguientes se sigan respondiendo.
+    Parámetros de Entrada: None
+    Parámetros de Salida: None
+    """
+    while True:
+        accion, texto = consultas.get()
+        try:
+            if accion == 'agregar':
+                indice_preguntas.agregar(texto)
+            else:
+                sugerencias = obtener_mejores_coincidencias(texto, base_preguntas, indice=indice_preguntas)
+                resultados.put((texto, sugerencias, None))
+        except Exception as e:
+            resultados.put((texto, None, e))
+
+def poll_results():
+    """
+    Muestra las respuestas que el hilo de búsqueda haya terminado y vuelve a programarse con root.after,
+    ya que los widgets de Tkinter solo deben usarse desde el hilo principal.
+    Parámetros de Entrada: None
+    Parámetros de Salida: None
+    """
+    while True:
+        try:
+            user_q, sugerencias, error = resultados.get_nowait()
+        except queue.Empty:
+            break
+        if error is not None:
+            messagebox.showerror("Error", f"No se pudo procesar la pregunta '{user_q}': {error}")
+        else:
+            show_matches(user_q, sugerencias)
+    root.after(50, poll_results)
+
+def show_matches(user_q, sugerencias):
+    """
+    Responde a la pregunta del usuario con la mejor coincidencia o, si no supera el umbral, muestra sugerencias.
+    Parámetros de Entrada:
+        user_q (str): Pregunta del usuario.
+        sugerencias (list): Tuplas (pregunta, respuesta, similitud) devueltas por obtener_mejores_coincidencias.
+    Parámetros de Salida: None
+    """
     mejor = sugerencias[0] if sugerencias else (None, None, 0)
     if mejor[2] >= SIMILARITY_THRESHOLD:
         respuesta = mejor[1]
@@ -319,8 +287,12 @@ def setup_gui():
     root.grid_rowconfigure(0, weight=1)
     root.grid_columnconfigure(0, weight=1)
 
-    chat_area = scrolledtext.ScrolledText(root, wrap=tk.WORD, state='disabled')
+    chat_area = scrolledtext.ScrolledText(root, wrap=tk.WORD)
     chat_area.grid(row=0, column=0, sticky='nsew', padx=5, pady=5)
+    chat_area.bind('<Key>', on_chat_key)
+    # Pegar con el botón del medio o desde el menú tampoco debe modificar el chat
+    for evento in ('<<Paste>>', '<<PasteSelection>>', '<<Cut>>', '<<Clear>>', '<<TkAccentBackspace>>'):
+        chat_area.bind(evento, lambda e: "break")
 
     suggestions_frame = tk.Frame(root)
     suggestions_frame.grid(row=1, column=0, sticky='ew', padx=5)
@@ -337,6 +309,9 @@ def setup_gui():
     root.bind('<Return>', on_send)
     entry.focus()
 
+    threading.Thread(target=matching_worker, daemon=True).start()
+    root.after(50, poll_results)
+
     update_chat("Bot", "¡Hola! Soy ChikiChiki Bot de F1. ¿En qué puedo ayudarte hoy?")
     root.mainloop()
 
@@ -0,0 +1,585 @@
+"""
+Funciones de lectura de la base, normalización de texto y búsqueda de coincidencias de ChikiChiki Bot.
+Se mantienen separadas de la interfaz gráfica (chatbot.py) para poder importarlas sin Tkinter.
+"""
+import atexit
+import bisect
+import difflib
+import json
+import time
+import unicodedata
+import os
+import csv
+import codecs
+import heapq
+import io
+import mmap
+import pickle
+from collections import defaultdict
+from functools import lru_cache, partial
+try:
+    # PyStemmer es opcional: es el mismo Snowball español que el de NLTK, compilado en C, y da las mismas raíces
+    import Stemmer
+except ImportError:
+    Stemmer = None
+    from nltk.stem.snowball import SnowballStemmer
+try:
+    # rapidfuzz es opcional: si no está instalado se usa difflib
+    from rapidfuzz import fuzz as rf_fuzz, process as rf_process
+except ImportError:
+    rf_process = None
+try:
+    # difflib_fast es opcional: calcula en Rust exactamente el mismo ratio() que difflib
+    import difflib_fast
+except ImportError:
+    difflib_fast = None
+try:
+    # orjson es opcional: si no está instalado se usa el módulo json estándar
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    # ijson es opcional: permite recorrer un archivo JSON muy grande de a una entrada, sin cargarlo completo
+    import ijson
+except ImportError:
+    ijson = None
+
+# =========================================
+# Configuración y constantes
+# =========================================
+if Stemmer is not None:
+    stemmer = Stemmer.Stemmer('spanish')
+    _stem_palabra = stemmer.stemWord
+else:
+    stemmer = SnowballStemmer('spanish')
+    _stem_palabra = stemmer.stem
+# El vocabulario de la base se repite mucho: las raíces se memorizan por palabra (el stemmer de NLTK es Python puro)
+_stem = lru_cache(maxsize=100_000)(_stem_palabra)
+
+# Archivos de datos ubicados en el mismo directorio que este script
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+NOMBRE_CSV = os.path.join(BASE_DIR, 'preguntas.csv')
+NOMBRE_TXT = os.path.join(BASE_DIR, 'preguntas.txt')
+NOMBRE_JSON = os.path.join(BASE_DIR, 'preguntas.json')
+NOMBRE_JSONL = os.path.join(BASE_DIR, 'preguntas.jsonl')
+LOG_FILE = os.path.join(BASE_DIR, 'log.txt')
+FORMATO_FECHA_LOG = "%Y-%m-%d %H:%M:%S"
+# Caché de la base ya leída y normalizada; se invalida si cambia el archivo de datos, el stemmer o VERSION_CACHE
+NOMBRE_CACHE = os.path.join(BASE_DIR, 'preguntas.cache.pkl')
+VERSION_CACHE = 1
+SIMILARITY_THRESHOLD = 0.7
+# A partir de este tamaño (bytes) los archivos de datos se leen mapeándolos en memoria
+UMBRAL_MMAP = 1 << 20
+# A partir de este tamaño (bytes), si ijson está instalado, el archivo JSON se lee por partes: tarda más pero
+# evita tener en memoria a la vez el arreglo completo decodificado y las tuplas de la base
+UMBRAL_STREAMING_JSON = 32 << 20
+
+# orjson.JSONDecodeError hereda de json.JSONDecodeError, así que el manejo de errores es el mismo
+_cargar_json = orjson.loads if orjson is not None else json.loads
+_ERRORES_JSON = (json.JSONDecodeError, ijson.JSONError) if ijson is not None else json.JSONDecodeError
+
+# Tabla para str.translate que elimina los signos de puntuación
+_PUNTUACION = str.maketrans('', '', '¿¡!"#$%&()*+,-./:;<=>?@[\\]^_`{|}~')
+
+# Tabla que reemplaza directamente cada letra acentuada latina (á, é, ñ, ü, ö...) por su letra base. Se arma
+# descomponiendo cada letra con NFD y quitándole las marcas del bloque de diacríticos combinables U+0300-U+036F
+# (tildes, diéresis, virgulilla). También quita '¿' y '¡', que de todos modos se eliminan como puntuación,
+# para que una pregunta típica en español quede en ASCII sin pasar por unicodedata.
+_SIN_ACENTOS = {ord('¿'): None, ord('¡'): None}
+_marcas = dict.fromkeys(range(0x300, 0x370))
+for _cp in range(0xC0, 0x180):
+    _base = unicodedata.normalize('NFD', chr(_cp)).translate(_marcas)
+    if _base != chr(_cp) and _base.isascii():
+        _SIN_ACENTOS[_cp] = _base
+del _cp, _base, _marcas
+
+
+class _TablaMarcasMn(dict):
+    """
+    Objetivo: Tabla para str.translate que elimina cualquier marca combinable (categoría Unicode Mn) del resto del
+    texto no ASCII. En lugar de recorrer todo Unicode al importar, la categoría de cada carácter se consulta la
+    primera vez que aparece y queda guardada en la tabla.
+    """
+
+    def __missing__(self, codigo):
+        valor = None if unicodedata.category(chr(codigo)) == 'Mn' else codigo
+        self[codigo] = valor
+        return valor
+
+
+# Para el resto del texto no ASCII, después de la descomposición NFD (ver normalizar_texto)
+_MARCAS_MN = _TablaMarcasMn()
+
+# Archivo de log abierto una sola vez por sesión (ver registrar_en_log)
+_log_handle = None
+# Cantidad de errores informados al leer archivos de datos (ver leer_base_con_cache)
+_errores_lectura = 0
+
+# =========================================
+# Funciones originales de lectura y procesamiento
+# =========================================
+
+def _informar_error_lectura(mensaje):
+    """
+    Objetivo: Mostrar un error de lectura de un archivo de datos y contarlo, para que leer_base_con_cache no
+    guarde en el caché una base que se leyó mal o de forma incompleta.
+    Parámetros de Entrada: mensaje (str): Mensaje a mostrar.
+    Parámetros de Salida: None
+    """
+    global _errores_lectura
+    _errores_lectura += 1
+    print(mensaje)
+
+
+def leer_texto(nombre_archivo):
+    """
+    Objetivo: Leer completo un archivo de texto UTF-8 (con o sin BOM), sin traducir los saltos de línea.
+    Los archivos grandes se mapean en memoria y se decodifican directamente desde el mapeo.
+    Parámetros de Entrada: nombre_archivo (str): Nombre del archivo a leer.
+    Parámetros de Salida: str: Contenido del archivo.
+    """
+    with open(nombre_archivo, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < UMBRAL_MMAP:
+            return f.read().decode('utf-8-sig')
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, 'utf-8-sig')
+
+
+def leer_preguntas_csv(nombre_archivo):
+    """
+    Objetivo: Leer preguntas y respuestas desde un archivo CSV separado por ';'.
+    Parámetros de Entrada: nombre_archivo (str): Nombre del archivo CSV a leer.
+    Parámetros de Salida: list: Lista de tuplas con pares (pregunta, respuesta).
+    """
+    preguntas_respuestas = []
+    try:
+        contenido = leer_texto(nombre_archivo)
+        # Con newline='' las líneas se cortan solo en '\r', '\n' y '\r\n', como al leer el archivo con csv.reader
+        # (str.splitlines también cortaría en '\x0c', '\x85', U+2028...)
+        lineas = io.StringIO(contenido, newline='')
+        if '"' in contenido:
+            # Hay campos entre comillas (csv.writer los genera al escapar ';'): se delega en el módulo csv
+            filas = csv.reader(lineas, delimiter=';')
+        else:
+            # Una línea vacía no es una fila, igual que en csv.reader
+            filas = (linea.split(';') for linea in (linea.rstrip('\r\n') for linea in lineas) if linea)
+        primera_fila = True
+        for row in filas:
+            if not row:
+                continue
+            pregunta = row[0].strip()
+            if primera_fila:
+                primera_fila = False
+                if pregunta.lower() == 'pregunta':
+                    continue
+            respuesta = row[1].strip() if len(row) > 1 else ""
+            preguntas_respuestas.append((pregunta, respuesta))
+    except FileNotFoundError:
+        return preguntas_respuestas
+    except Exception as e:
+        _informar_error_lectura(f"Error al leer el archivo CSV: {e}")
+    return preguntas_respuestas
+
+
+def leer_preguntas_txt(nombre_archivo):
+    """
+    Objetivo: Leer preguntas y respuestas desde un archivo de texto, cada línea con formato "pregunta:respuesta".
+    Parámetros de Entrada: nombre_archivo (str): Nombre del archivo TXT a leer.
+    Parámetros de Salida: list: Lista de tuplas con pares (pregunta, respuesta).
+    """
+    preguntas_respuestas = []
+    try:
+        # newline=None corta en '\n', '\r' y '\r\n' como al iterar el archivo en modo texto
+        # (str.splitlines también cortaría en '\x0c', '\x85', U+2028...)
+        lineas = io.StringIO(leer_texto(nombre_archivo), newline=None)
+        preguntas_respuestas = [(pregunta.strip(), respuesta.strip())
+                                for pregunta, _, respuesta in (line.partition(':') for line in lineas if line.strip())]
+    except FileNotFoundError:
+        return preguntas_respuestas
+    except Exception as e:
+        _informar_error_lectura(f"Error al leer el archivo de texto: {e}")
+    return preguntas_respuestas
+
+
+def leer_preguntas_json(nombre_archivo):
+    """
+    Objetivo: Leer preguntas y respuestas desde un archivo JSON con objetos que contienen "pregunta" y "respuesta".
+    Parámetros de Entrada: nombre_archivo (str): Nombre del archivo JSON a leer.
+    Parámetros de Salida: list: Lista de tuplas con pares (pregunta, respuesta).
+    """
+    preguntas_respuestas = []
+    try:
+        with open(nombre_archivo, 'rb') as jsonfile:
+            if ijson is not None and os.fstat(jsonfile.fileno()).st_size >= UMBRAL_STREAMING_JSON:
+                if jsonfile.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+                    jsonfile.seek(0)
+                # Solo produce los elementos de un arreglo en la raíz, igual que el chequeo de isinstance de abajo
+                data = ijson.items(jsonfile, 'item')
+            else:
+                data = _cargar_json(jsonfile.read().removeprefix(codecs.BOM_UTF8))
+                if not isinstance(data, list):
+                    data = []
+            for entrada in data:
+                pregunta = entrada.get("pregunta", "").strip()
+                respuesta = entrada.get("respuesta", "").strip()
+                preguntas_respuestas.append((pregunta, respuesta))
+    except FileNotFoundError:
+        return preguntas_respuestas
+    except _ERRORES_JSON:
+        # Un archivo inválido se descarta completo, aunque con ijson ya se hubieran leído algunas entradas
+        _informar_error_lectura(f"Error: El archivo JSON '{nombre_archivo}' no es válido.")
+        return []
+    except Exception as e:
+        _informar_error_lectura(f"Error al leer el archivo JSON: {e}")
+    return preguntas_respuestas
+
+
+def leer_preguntas_jsonl(nombre_archivo):
+    """
+    Objetivo: Leer preguntas y respuestas desde un archivo JSON Lines, una línea por objeto con "pregunta" y "respuesta".
+    Al agregar preguntas solo se escribe una línea al final, sin reescribir el archivo.
+    Parámetros de Entrada: nombre_archivo (str): Nombre del archivo JSONL a leer.
+    Parámetros de Salida: list: Lista de tuplas con pares (pregunta, respuesta).
+    """
+    preguntas_respuestas = []
+    try:
+        # Solo '\n' separa registros: json.dumps y orjson no escapan U+2028, U+2029 ni '\x85' dentro de los textos,
+        # y str.splitlines cortaría ahí (un '\r' final de Windows es espacio en blanco válido para JSON)
+        for numero, linea in enumerate(leer_texto(nombre_archivo).split('\n'), start=1):
+            if not linea.strip():
+                continue
+            try:
+                entrada = _cargar_json(linea)
+            except json.JSONDecodeError:
+                entrada = None
+            if isinstance(entrada, dict):
+                pregunta = entrada.get("pregunta", "")
+                respuesta = entrada.get("respuesta", "")
+            if not (isinstance(entrada, dict) and isinstance(pregunta, str) and isinstance(respuesta, str)):
+                # Una línea dañada (por ejemplo, una escritura interrumpida) o que no es un objeto con textos
+                # no invalida el resto del archivo
+                _informar_error_lectura(f"Error: La línea {numero} del archivo JSONL '{nombre_archivo}' no es válida.")
+                continue
+            preguntas_respuestas.append((pregunta.strip(), respuesta.strip()))
+    except FileNotFoundError:
+        return preguntas_respuestas
+    except Exception as e:
+        _informar_error_lectura(f"Error al leer el archivo JSONL: {e}")
+    return preguntas_respuestas
+
+
+def linea_jsonl(pregunta, respuesta):
+    """
+    Objetivo: Serializar un par pregunta/respuesta como una línea de JSON Lines (con orjson si está instalado).
+    Parámetros de Entrada: pregunta (str), respuesta (str): Par a serializar.
+    Parámetros de Salida: str: Objeto JSON compacto terminado en salto de línea.
+    """
+    entrada = {"pregunta": pregunta, "respuesta": respuesta}
+    if orjson is not None:
+        return orjson.dumps(entrada).decode('utf-8') + "\n"
+    return json.dumps(entrada, ensure_ascii=False) + "\n"
+
+
+def agregar_pregunta_json(nombre_archivo, pregunta, respuesta):
+    """
+    Objetivo: Agregar un par pregunta/respuesta al final del arreglo de un archivo JSON escribiendo solo
+    el elemento nuevo, sin volver a serializar la base completa.
+    Parámetros de Entrada:
+        nombre_archivo (str): Nombre del archivo JSON.
+        pregunta (str): Pregunta a agregar.
+        respuesta (str): Respuesta a agregar.
+    Parámetros de Salida: bool: True si se agregó; False si el archivo no termina en un arreglo JSON.
+    """
+    entrada = json.dumps({"pregunta": pregunta, "respuesta": respuesta}, ensure_ascii=False, indent=4)
+    entrada = entrada.replace('\n', '\n    ')
+    with open(nombre_archivo, 'r+b') as f:
+        largo = f.seek(0, os.SEEK_END)
+        inicio_cola = max(0, largo - 4096)
+        f.seek(inicio_cola)
+        cola = f.read().rstrip()
+        if not cola.endswith(b']'):
+            return False
+        # Se reemplaza el ']' final (y el espacio previo) por ', <entrada>\n]'
+        contenido = cola[:-1].rstrip()
+        if not contenido:
+            return False
+        separador = '' if contenido.endswith(b'[') else ','
+        f.seek(inicio_cola + len(contenido))
+        f.truncate()
+        f.write(f"{separador}\n    {entrada}\n]".encode('utf-8'))
+    return True
+
+
+@lru_cache(maxsize=10_000)
+def normalizar_texto(texto):
+    """
+    Objetivo: Normalizar un texto eliminando acentos, puntuación, convirtiendo a minúsculas y aplicando stemización.
+    Parámetros de Entrada: texto (str): Texto a normalizar.
+    Parámetros de Salida: str: Texto normalizado con stemming.
+    """
+    texto = texto.lower()
+    # Un texto ASCII no tiene acentos que quitar; para el resto alcanza casi siempre con la tabla
+    # _SIN_ACENTOS, y solo si quedan caracteres no ASCII se recurre a la descomposición NFD
+    if not texto.isascii():
+        texto = texto.translate(_SIN_ACENTOS)
+        if not texto.isascii():
+            texto = unicodedata.normalize('NFD', texto).translate(_MARCAS_MN)
+    texto = texto.translate(_PUNTUACION)
+    palabras = texto.split()
+    stems = [_stem(palabra) for palabra in palabras]
+    return ' '.join(stems)
+
+
+def calcular_similitud(pregunta1, pregunta2):
+    """
+    Objetivo: Calcular el puntaje de similitud entre dos preguntas usando difflib (o difflib_fast si está instalado).
+    Parámetros de Entrada: pregunta1 (str), pregunta2 (str): Preguntas a comparar.
+    Parámetros de Salida: float: Puntaje de similitud entre 0 y 1.
+    """
+    norm1 = normalizar_texto(pregunta1)
+    norm2 = normalizar_texto(pregunta2)
+    if difflib_fast is not None:
+        return difflib_fast.ratio(norm1, norm2)
+    return difflib.SequenceMatcher(None, norm1, norm2, autojunk=False).ratio()
+
+
+def similitud_tokens(tokens1, tokens2):
+    """
+    Objetivo: Calcular el índice de Jaccard entre dos conjuntos de raíces (stems), sin importar su orden.
+    Parámetros de Entrada: tokens1 (frozenset), tokens2 (frozenset): Conjuntos de raíces a comparar.
+    Parámetros de Salida: float: Puntaje de similitud entre 0 y 1.
+    """
+    comunes = len(tokens1 & tokens2)
+    union = len(tokens1) + len(tokens2) - comunes
+    return comunes / union if union else 0.0
+
+
+class IndicePreguntas:
+    """
+    Objetivo: Mantener la forma normalizada de cada pregunta de la base, su conjunto de raíces y un índice
+    invertido raíz -> preguntas, calculados una sola vez, para que cada consulta solo tenga que normalizar
+    la pregunta del usuario y comparar contra las preguntas que comparten alguna raíz con ella.
+    Parámetros de Entrada: base_preguntas (list): Lista de tuplas (pregunta, respuesta).
+    """
+
+    def __init__(self, base_preguntas, normalizadas=None):
+        self.normalizadas = []
+        self.largos = []  # largo de cada pregunta normalizada, para acotar ratio() sin compararlas
+        self.tokens = []
+        self.posiciones_por_raiz = defaultdict(list)
+        self.exactas = {}  # pregunta normalizada -> posición de su primera aparición
+        # Resultados de las últimas consultas (un clic en una sugerencia repite la búsqueda); se vacía al agregar
+        self.mejores = lru_cache(maxsize=256)(partial(_mejores_posiciones, self))
+        if normalizadas is None:
+            normalizadas = [normalizar_texto(pregunta) for pregunta, _ in base_preguntas]
+        for normalizada in normalizadas:
+            self.agregar_normalizada(normalizada)
+
+    def agregar(self, pregunta):
+        """
+        Objetivo: Incorporar al índice una pregunta nueva agregada a la base.
+        Parámetros de Entrada: pregunta (str): Pregunta a indexar.
+        Parámetros de Salida: None
+        """
+        self.agregar_normalizada(normalizar_texto(pregunta))
+
+    def agregar_normalizada(self, normalizada):
+        """
+        Objetivo: Incorporar al índice una pregunta que ya pasó por normalizar_texto (por ejemplo, leída del caché).
+        Parámetros de Entrada: normalizada (str): Pregunta normalizada a indexar.
+        Parámetros de Salida: None
+        """
+        self.mejores.cache_clear()
+        tokens = frozenset(normalizada.split())
+        for token in tokens:
+            self.posiciones_por_raiz[token].append(len(self.normalizadas))
+        self.exactas.setdefault(normalizada, len(self.normalizadas))
+        self.normalizadas.append(normalizada)
+        self.largos.append(len(normalizada))
+        self.tokens.append(tokens)
+
+    def candidatos(self, tokens_usuario, minimo=1):
+        """
+        Objetivo: Obtener las posiciones de las preguntas que comparten alguna raíz con la consulta.
+        Las raíces presentes en más de la mitad de la base (que, de, el...) no discriminan y se ignoran.
+        Parámetros de Entrada:
+            tokens_usuario (frozenset): Raíces de la pregunta del usuario.
+            minimo (int): Si quedan menos candidatas que este valor se devuelve la base completa.
+        Parámetros de Salida: list: Posiciones candidatas, en orden creciente.
+        """
+        limite = len(self.normalizadas) // 2
+        posiciones = set()
+        for token in tokens_usuario:
+            lista = self.posiciones_por_raiz.get(token)
+            if lista and len(lista) <= limite:
+                posiciones.update(lista)
+        if len(posiciones) < minimo:
+            return range(len(self.normalizadas))
+        return sorted(posiciones)
+
+
+def _mejores_posiciones(indice, norm_usuario, n):
+    """
+    Objetivo: Calcular las n mejores similitudes de la base para una pregunta ya normalizada que no coincide
+    exactamente con ninguna. Se usa a través de IndicePreguntas.mejores, que memoriza los resultados.
+    Parámetros de Entrada:
+        indice (IndicePreguntas): Índice de la base.
+        norm_usuario (str): Pregunta del usuario normalizada.
+        n (int): Cantidad de resultados (mayor que 0).
+    Parámetros de Salida: tuple: Pares (similitud, -posición), de mayor a menor.
+    """
+    tokens_usuario = frozenset(norm_usuario.split())
+    candidatos = indice.candidatos(tokens_usuario, minimo=n)
+    # En todos los casos se eligen las n mejores (similitud, -posición): a igual similitud gana la primera pregunta
+    if rf_process is not None:
+        opciones = {i: indice.normalizadas[i] for i in candidatos}
+        similitudes = {i: similitud_tokens(tokens_usuario, indice.tokens[i]) for i in candidatos}
+        # La n-ésima mejor similitud de Jaccard es un piso del resultado: un ratio menor no cambia nada, así que
+        # rapidfuzz puede descartarlo sin terminar de calcularlo (el margen conserva los empates con el piso)
+        piso = heapq.nlargest(n, similitudes.values())[-1] if len(similitudes) >= n else 0.0
+        for _, puntaje, i in rf_process.extract(norm_usuario, opciones, scorer=rf_fuzz.ratio, limit=None,
+                                                score_cutoff=max(piso * 100 - 1e-6, 0)):
+            if puntaje / 100 > similitudes[i]:
+                similitudes[i] = puntaje / 100
+        mejores = heapq.nlargest(n, ((sim, -i) for i, sim in similitudes.items()))
+    elif difflib_fast is not None:
+        # Un solo llamado puntúa todas las candidatas en paralelo, en Rust y sin el GIL
+        ratios = difflib_fast.ratio([(indice.normalizadas[i], norm_usuario) for i in candidatos])
+        puntajes = ((max(ratio, similitud_tokens(tokens_usuario, indice.tokens[i])), -i)
+                    for i, ratio in zip(candidatos, ratios))
+        mejores = heapq.nlargest(n, puntajes)
+    else:
+        # La pregunta del usuario va como secuencia b: SequenceMatcher indexa b una sola vez y se reutiliza
+        matcher = difflib.SequenceMatcher(None, b=norm_usuario, autojunk=False)
+        largo_usuario = len(norm_usuario)
+        # ratio() nunca supera la cota por largos 2*min(la, lb)/(la + lb) (la misma de real_quick_ratio), que
+        # decrece a ambos lados de largo_usuario. Las candidatas se recorren de la más cercana en largo a la más
+        # lejana; cuando la cota queda por debajo de la n-ésima mejor similitud, al resto solo le queda su Jaccard
+        largos = indice.largos
+        por_largo = sorted(candidatos, key=largos.__getitem__)
+        largos_ordenados = [largos[i] for i in por_largo]
+        izq = der = bisect.bisect_left(largos_ordenados, largo_usuario)
+        mejores = []  # montículo con las n mejores (similitud, -posición) vistas hasta el momento
+        while izq > 0 or der < len(por_largo):
+            cota_izq = 2.0 * largos_ordenados[izq - 1] / (largos_ordenados[izq - 1] + largo_usuario) if izq > 0 else -1.0
+            cota_der = 2.0 * largo_usuario / (largos_ordenados[der] + largo_usuario) if der < len(por_largo) else -1.0
+            if len(mejores) == n and max(cota_izq, cota_der) < mejores[0][0]:
+                resto = por_largo[:izq] + por_largo[der:]
+                break
+            if cota_izq > cota_der:
+                izq -= 1
+                i, cota = por_largo[izq], cota_izq
+            else:
+                i, cota = por_largo[der], cota_der
+                der += 1
+            sim = similitud_tokens(tokens_usuario, indice.tokens[i])
+            # Solo hace falta ratio() si podría superar al Jaccard y a la n-ésima mejor (similitud, -posición);
+            # quick_ratio es la siguiente cota superior barata de ratio()
+            if cota > sim and (len(mejores) < n or (cota, -i) > mejores[0]):
+                matcher.set_seq1(indice.normalizadas[i])
+                cota = matcher.quick_ratio()
+                if cota > sim and (len(mejores) < n or (cota, -i) > mejores[0]):
+                    sim = max(sim, matcher.ratio())
+            if len(mejores) < n:
+                heapq.heappush(mejores, (sim, -i))
+            elif (sim, -i) > mejores[0]:
+                heapq.heapreplace(mejores, (sim, -i))
+        else:
+            resto = ()
+        for i in resto:
+            puntaje = (similitud_tokens(tokens_usuario, indice.tokens[i]), -i)
+            if puntaje > mejores[0]:
+                heapq.heapreplace(mejores, puntaje)
+        mejores.sort(reverse=True)
+    return tuple(mejores)
+
+
+def obtener_mejores_coincidencias(pregunta_usuario, base_preguntas, n=3, indice=None):
+    """
+    Objetivo: Obtener las n preguntas más similares de la base. La similitud es la mayor entre la de caracteres
+    (rapidfuzz si está disponible; si no, el ratio() de difflib, calculado en lote con difflib_fast si está instalado)
+    y la de Jaccard entre los conjuntos de raíces.
+    Parámetros de Entrada: 
+        pregunta_usuario (str): Pregunta ingresada por el usuario.
+        base_preguntas (list): Lista de preguntas y respuestas.
+        n (int): Cantidad de sugerencias a devolver.
+        indice (IndicePreguntas): Índice ya construido sobre base_preguntas (opcional).
+    Parámetros de Salida: list: Lista de tuplas (pregunta, respuesta, similitud). Si la pregunta normalizada
+        coincide exactamente con una de la base, solo se devuelve esa, con similitud 1.0.
+    """
+    if indice is None:
+        indice = IndicePreguntas(base_preguntas)
+    norm_usuario = normalizar_texto(pregunta_usuario)
+    exacta = indice.exactas.get(norm_usuario)
+    if exacta is not None:
+        return [(base_preguntas[exacta][0], base_preguntas[exacta][1], 1.0)]
+    if n <= 0:
+        return []
+    mejores = indice.mejores(norm_usuario, n)
+    return [(base_preguntas[-i][0], base_preguntas[-i][1], sim) for sim, i in mejores]
+
+
+def leer_base_con_cache(nombre_archivo, leer_preguntas):
+    """
+    Objetivo: Leer la base de preguntas y construir su índice reutilizando NOMBRE_CACHE, que guarda la base ya
+    leída junto con sus preguntas normalizadas. El caché solo se usa si corresponde al mismo archivo con la misma
+    fecha de modificación y tamaño; si no, se lee el archivo, se normaliza y se vuelve a escribir el caché
+    (salvo que la lectura haya informado algún error).
+    Parámetros de Entrada:
+        nombre_archivo (str): Ruta del archivo de datos.
+        leer_preguntas (function): Función de lectura para el formato del archivo (leer_preguntas_csv, etc.).
+    Parámetros de Salida: tuple: (base_preguntas, IndicePreguntas)
+    """
+    info = os.stat(nombre_archivo)
+    firma = (VERSION_CACHE, type(stemmer).__module__, os.path.abspath(nombre_archivo), info.st_mtime_ns, info.st_size)
+    try:
+        with open(NOMBRE_CACHE, 'rb') as f:
+            firma_cache, base_preguntas, normalizadas = pickle.load(f)
+        if firma_cache == firma:
+            return base_preguntas, IndicePreguntas(base_preguntas, normalizadas)
+    except Exception:
+        # Caché inexistente, de otra versión o dañado: se reconstruye desde el archivo de datos
+        pass
+    errores_previos = _errores_lectura
+    base_preguntas = leer_preguntas(nombre_archivo)
+    indice = IndicePreguntas(base_preguntas)
+    if _errores_lectura != errores_previos:
+        # Lectura fallida o incompleta: no se guarda, así el error se vuelve a mostrar en el próximo inicio
+        return base_preguntas, indice
+    try:
+        with open(NOMBRE_CACHE, 'wb') as f:
+            pickle.dump((firma, base_preguntas, indice.normalizadas), f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
+    return base_preguntas, indice
+
+
+def registrar_en_log(pregunta, respuesta, similitud):
+    """
+    Objetivo: Registrar una interacción en el archivo log.txt.
+    Parámetros de Entrada: 
+        pregunta (str): Pregunta del usuario.
+        respuesta (str): Respuesta entregada.
+        similitud (float): Puntaje de similitud.
+    Parámetros de Salida: None
+    """
+    global _log_handle
+    if _log_handle is None:
+        # Se abre la primera vez y queda abierto hasta cerrar_log(), en lugar de abrir y cerrar por línea.
+        # Con buffer de línea cada registro llega al archivo al terminar su '\n', sin flush() explícito
+        _log_handle = open(LOG_FILE, "a", encoding="utf-8", buffering=1)
+        atexit.register(cerrar_log)
+    timestamp = time.strftime(FORMATO_FECHA_LOG)
+    _log_handle.write(f"{timestamp}\tPregunta: \"{pregunta}\"\tRespuesta: \"{respuesta}\"\tSimilitud: {similitud:.2f}\n")
+
+
+def cerrar_log():
+    """
+    Objetivo: Cerrar el archivo log.txt si quedó abierto durante la sesión.
+    Parámetros de Entrada: None
+    Parámetros de Salida: None
+    """
+    global _log_handle
+    if _log_handle is not None:
+        _log_handle.close()
+        _log_handle = None